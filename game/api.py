@@ -1,9 +1,13 @@
-from collections import Counter
+from typing import Optional, Tuple
 
-from game.models.model import ActionOutcome, GameState
+import numpy as np
+import torch
+
+from game.models.model import ActionOutcome, GameState, STATE_SIZE
 from game.models.player import Player
 from game.models.deck import Deck
 from game.models.constant import Card, PlayerType
+from game.models.scoring import get_hand_values
 
 
 class BlackjackWrapper:
@@ -18,18 +22,54 @@ class BlackjackWrapper:
         Initialise the game.
         """
         self.initial_cash: int = initial_cash
-        self.max_attained_cash: int = initial_cash
         self.min_bet: int = min_bet
-        self.remaining_cash: int = initial_cash
-        self.player_bet_percent: float = 0
         self.deck_nums: int = deck_nums
 
         self.dealer = Player(player_type=PlayerType.dealer)
         self.player = Player(player_type=PlayerType.player)
 
         self.deck = Deck(deck_nums=self.deck_nums)
-        self.discarded: Counter[Card] = Counter()
+        # count of each discarded card, indexed by CARD_INDEX
+        self.discarded: np.ndarray = np.zeros(len(Card), dtype=np.int16)
+        # deck is replaced once more than half of it has been used
+        self._reshuffle_threshold: int = len(self.deck.cards) // 2
+
+        self._init_fields()
+
+        # flattened states are written here instead of allocating a new array per step
+        self._state_buf: np.ndarray = np.empty(STATE_SIZE + 1)
+        # staging tensor for torch_flatten, pinned memory makes the copy to GPU faster
+        self._torch_buf: torch.Tensor = torch.empty(
+            (1, STATE_SIZE + 1),
+            pin_memory=torch.cuda.is_available(),
+        )
+
+        # a single state and outcome are updated and returned on every step instead of building new ones
+        self._state = GameState(
+            deck_nums=self.deck_nums,
+            initial_cash=self.initial_cash,
+            turn=self.turn,
+            hand=self.player.hand,
+            discarded=self.discarded,
+            bet_percent=self.player_bet_percent,
+            remaining_cash=self.remaining_cash,
+            state_buffer=self._state_buf,
+            torch_buffer=self._torch_buf,
+        )
+        self._outcome = ActionOutcome(new_state=self._state, reward=0.0, terminated=False)
+
+    def _init_fields(self) -> None:
+        """
+        Starts a new game with full cash and a full deck, reusing the existing players, deck and buffers
+        """
+        self.max_attained_cash: int = self.initial_cash
+        self.remaining_cash: int = self.initial_cash
+        self.player_bet_percent: float = 0
 
+        self.dealer.reset_hand()
+        self.player.reset_hand()
+        self.discarded.fill(0)
+        self.deck.reset_full()
         self.deck.shuffle()
 
         # always starts with player turn
@@ -41,21 +81,17 @@ class BlackjackWrapper:
         """
         if self.remaining_cash < self.min_bet:
             # ran out of cash, restart entire game
-            return BlackjackWrapper(
-                initial_cash=self.initial_cash, deck_nums=self.deck_nums
-            )
-
-        dealer_discarded = self.dealer.reset_hand()
-        player_discarded = self.player.reset_hand()
-        for card, amount in dealer_discarded.items():
-            self.discarded[card] += amount
-        for card, amount in player_discarded.items():
-            self.discarded[card] += amount
-
-        if self.deck.get_remaining_cards() < self.deck_nums * len(Card) * 4 // 2:
+            self._init_fields()
+            return self
+
+        self.discarded += self.dealer.reset_hand()
+        self.discarded += self.player.reset_hand()
+
+        # deck keeps a running count of its remaining cards, so this is a plain comparison
+        if self.deck.remaining < self._reshuffle_threshold:
             # used more than half the deck, reset deck
-            self.discarded = Counter()
-            self.deck = Deck(deck_nums=self.deck_nums)
+            self.discarded.fill(0)
+            self.deck.reset_full()
 
         self.deck.shuffle()
         self.player_bet_percent = 0
@@ -67,78 +103,73 @@ class BlackjackWrapper:
     def get_state(self) -> GameState:
         """
         Returns state of player (not dealer!)
+        The same GameState is updated and returned on every call, so read it before the next step
         """
-        return GameState(
-            deck_nums=self.deck_nums,
-            initial_cash=self.initial_cash,
-            turn=self.turn,
-            hand=self.player.hand,
-            discarded=self.discarded,
-            bet_percent=self.player_bet_percent,
-            remaining_cash=self.remaining_cash,
-        )
+        self._state.turn = self.turn
+        self._state.bet_percent = self.player_bet_percent
+        self._state.remaining_cash = self.remaining_cash
+        return self._state
+
+    def _get_outcome(self, reward: float, terminated: bool) -> ActionOutcome:
+        """
+        The same ActionOutcome is updated and returned on every step, so read it before the next step
+        """
+        self._outcome.new_state = self.get_state()
+        self._outcome.reward = reward
+        self._outcome.terminated = terminated
+        return self._outcome
+
+    def _get_bet_amount(self) -> int:
+        return max(int(self.remaining_cash * self.player_bet_percent), self.min_bet)
+
+    def _settle_bet(self, multiplier: int) -> float:
+        """
+        Pays out the bet times multiplier (negative for a loss, zero for a push) and returns the reward of the finished game
+        """
+        self.remaining_cash += multiplier * self._get_bet_amount()
+        self.max_attained_cash = max(self.max_attained_cash, self.remaining_cash)
+        return (
+            self.remaining_cash
+            if self.remaining_cash >= self.min_bet
+            else -self.max_attained_cash
+        ) / self.initial_cash
 
     def bet_step(self, bet_percent: float) -> ActionOutcome:
         """
         Must call this first at the start of each round
         """
-        reward = 0
+        reward = 0.0
         game_terminated = False
-        self.player_bet_percent = bet_percent
+        self.player_bet_percent = float(bet_percent)
 
         # draw 2 cards for each player and dealer, sequence matters
         self.player.draw(self.deck)
         self.dealer.draw(self.deck)
-        self.player.draw(self.deck)
-        self.dealer.draw(self.deck)
+        player_score = self.player.draw(self.deck)
+        dealer_score = self.dealer.draw(self.deck)
 
         # Implement natural blackjack rules for the dealer
         # Case 1 - Both have natural blackjack
-        if self.player.get_hand_value() == 21 and self.dealer.get_hand_value() == 21:
+        if player_score == 21 and dealer_score == 21:
             # push, no cash change
             game_terminated = True
         # Case 2 - Dealer has natural blackjack, loss is immediately
-        elif self.dealer.get_hand_value() == 21:
+        elif dealer_score == 21:
             # loss, immediately lose
             game_terminated = True
-            loss_cash = max(
-                int(self.remaining_cash * self.player_bet_percent), self.min_bet
-            )
-            self.remaining_cash -= loss_cash
-            reward = (
-                self.remaining_cash
-                if self.remaining_cash >= self.min_bet
-                else -self.max_attained_cash
-            ) / self.initial_cash
-
-        return ActionOutcome(
-            new_state=GameState(
-                deck_nums=self.deck_nums,
-                initial_cash=self.initial_cash,
-                turn=self.turn,
-                hand=self.player.hand,
-                discarded=self.discarded,
-                bet_percent=self.player_bet_percent,
-                remaining_cash=self.remaining_cash,
-            ),
-            reward=reward,
-            terminated=game_terminated,
-        )
+            reward = self._settle_bet(-1)
+
+        return self._get_outcome(reward=reward, terminated=game_terminated)
 
     def card_step(self, take_card: bool) -> ActionOutcome:
         game_terminated = False
-        reward = None
-        bet_amount = max(
-            int(self.remaining_cash * self.player_bet_percent), self.min_bet
-        )
+        reward = 0.0
 
         if take_card:
-            self.player.draw(self.deck)
-            if self.player.get_hand_value() > 21:
+            if self.player.draw(self.deck) > 21:
                 # bust, immediately lose
                 game_terminated = True
-                loss_cash = bet_amount
-                self.remaining_cash -= loss_cash
+                reward = self._settle_bet(-1)
             else:
                 # not bust, continue
                 game_terminated = False
@@ -151,54 +182,215 @@ class BlackjackWrapper:
             else:
                 game_terminated = True
                 # Player has natural blackjack, outcome is immediate and wins 2 times the bet
-                if player_score == 21 and len(self.player.hand) == 2:
-                    win_cash = bet_amount * 2
-                    self.remaining_cash += win_cash
+                if player_score == 21 and self.player.hand.sum() == 2:
+                    reward = self._settle_bet(2)
                 else:
                     # Draw card until score is greater than or equal to 17 for dealer (house rules)
-                    while self.dealer.get_hand_value() < 17:
-                        self.dealer.draw(self.deck)
+                    dealer_score = self.dealer.play_dealer_turn(self.deck)
 
                     # Check if dealer busts or has a score greater than player here and update game_reward accordingly
-                    dealer_score = self.dealer.get_hand_value()
                     if dealer_score > 21:
                         # dealer bust, player wins
-                        win_cash = bet_amount
-                        self.remaining_cash += win_cash
+                        reward = self._settle_bet(1)
                     elif dealer_score > player_score:
                         # dealer score is higher than player, player loses
-                        loss_cash = bet_amount
-                        self.remaining_cash -= loss_cash
+                        reward = self._settle_bet(-1)
                     elif dealer_score == player_score:
                         # no difference in score, zero change
-                        ...
+                        reward = self._settle_bet(0)
                     else:
                         # player score is higher than dealer, player wins
-                        win_cash = bet_amount
-                        self.remaining_cash += win_cash
-        self.max_attained_cash = max(self.max_attained_cash, self.remaining_cash)
-        reward = reward or (
-            (
-                (
-                    self.remaining_cash
-                    if self.remaining_cash >= self.min_bet
-                    else -self.max_attained_cash
-                )
-                / self.initial_cash
-            )
-            if game_terminated
-            else 0
-        )
-        return ActionOutcome(
-            new_state=GameState(
-                deck_nums=self.deck_nums,
-                initial_cash=self.initial_cash,
-                turn=self.turn,
-                hand=self.player.hand,
-                discarded=self.discarded,
-                bet_percent=self.player_bet_percent,
-                remaining_cash=self.remaining_cash,
-            ),
-            reward=reward,
-            terminated=game_terminated,
+                        reward = self._settle_bet(1)
+        return self._get_outcome(reward=reward, terminated=game_terminated)
+
+
+class VectorBlackjackWrapper:
+    """
+    Runs num_envs independent games side by side, so a single call advances every game at once
+    Mirrors BlackjackWrapper, with per-game values held as arrays of one row per game
+    A game that has terminated ignores further steps until it is reset
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        initial_cash: int = 100,
+        deck_nums: int = 4,
+        min_bet: int = 10,
+    ):
+        """
+        Initialise the games.
+        """
+        self.num_envs: int = num_envs
+        self.initial_cash: int = initial_cash
+        self.min_bet: int = min_bet
+        self.deck_nums: int = deck_nums
+        self.deck_size: int = deck_nums * len(Card) * 4
+        # deck is replaced once more than half of it has been used
+        self._reshuffle_threshold: int = self.deck_size // 2
+
+        self.max_attained_cash: np.ndarray = np.full(num_envs, initial_cash, dtype=np.int64)
+        self.remaining_cash: np.ndarray = np.full(num_envs, initial_cash, dtype=np.int64)
+        self.player_bet_percent: np.ndarray = np.zeros(num_envs)
+        self.terminated: np.ndarray = np.zeros(num_envs, dtype=bool)
+
+        # card counts of each game, indexed by CARD_INDEX
+        self.dealer_hands: np.ndarray = np.zeros((num_envs, len(Card)), dtype=np.int16)
+        self.player_hands: np.ndarray = np.zeros((num_envs, len(Card)), dtype=np.int16)
+        self.discarded: np.ndarray = np.zeros((num_envs, len(Card)), dtype=np.int16)
+
+        # one deck per game, stored and drawn like Deck.cards
+        self.decks: np.ndarray = np.tile(Deck(deck_nums=self.deck_nums).cards, (num_envs, 1))
+        self.remaining_cards: np.ndarray = np.full(num_envs, self.deck_size, dtype=np.int64)
+        self._rows: np.ndarray = np.arange(num_envs)
+
+        self._shuffle(np.ones(num_envs, dtype=bool))
+
+    def _shuffle(self, mask: np.ndarray) -> None:
+        """
+        Shuffles the cards still left in the decks of the masked games
+        """
+        rows = self._rows[mask]
+        keys = np.random.random((len(rows), self.deck_size))
+        # keep drawn cards past the end of the remaining cards
+        keys[np.arange(self.deck_size) >= self.remaining_cards[rows, None]] = 2
+        order = np.argsort(keys, axis=1, kind="stable")
+        self.decks[rows] = np.take_along_axis(self.decks[rows], order, axis=1)
+
+    def _draw(self, hands: np.ndarray, mask: np.ndarray) -> None:
+        """
+        Draws one card into the hands of the masked games
+        """
+        rows = self._rows[mask]
+        if (self.remaining_cards[rows] == 0).any():
+            raise IndexError("draw from empty deck")
+        self.remaining_cards[rows] -= 1
+        hands[rows, self.decks[rows, self.remaining_cards[rows]]] += 1
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> "VectorBlackjackWrapper":
+        """
+        Next game of the masked games (all by default) reshuffles the deck and recollects discarded cards
+        """
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+
+        # ran out of cash, restart entire game
+        ruined = mask & (self.remaining_cash < self.min_bet)
+        self.remaining_cash[ruined] = self.initial_cash
+        self.max_attained_cash[ruined] = self.initial_cash
+
+        self.discarded[mask] += self.dealer_hands[mask] + self.player_hands[mask]
+        self.dealer_hands[mask] = 0
+        self.player_hands[mask] = 0
+
+        # used more than half the deck, reset deck
+        new_deck = ruined | (mask & (self.remaining_cards < self._reshuffle_threshold))
+        self.discarded[new_deck] = 0
+        self.remaining_cards[new_deck] = self.deck_size
+
+        self._shuffle(mask)
+        self.player_bet_percent[mask] = 0
+        self.terminated[mask] = False
+        return self
+
+    def flatten(self, include_discarded: bool = True, step_num: Optional[float] = None) -> np.ndarray:
+        """
+        Flattens the state of every game into a row, matching GameState.flatten
+        """
+        num_cards = len(Card)
+        output = np.zeros((self.num_envs, STATE_SIZE if step_num is None else STATE_SIZE + 1))
+        np.divide(self.player_hands, self.deck_nums, out=output[:, :num_cards])
+        if include_discarded:
+            np.divide(self.discarded, self.deck_nums, out=output[:, num_cards:num_cards * 2])
+        output[:, STATE_SIZE - 2] = self.player_bet_percent
+        output[:, STATE_SIZE - 1] = self.remaining_cash / self.initial_cash
+        if step_num is not None:
+            output[:, STATE_SIZE] = step_num
+        return output
+
+    def _get_bet_amounts(self) -> np.ndarray:
+        return np.maximum(
+            (self.remaining_cash * self.player_bet_percent).astype(np.int64), self.min_bet
         )
+
+    def _get_terminal_rewards(self) -> np.ndarray:
+        return np.where(
+            self.remaining_cash >= self.min_bet,
+            self.remaining_cash,
+            -self.max_attained_cash,
+        ) / self.initial_cash
+
+    def bet_step(self, bet_percent: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Must call this first at the start of each round
+        Returns the reward and whether the game has terminated, for each game
+        """
+        active = ~self.terminated
+        self.player_bet_percent[active] = np.broadcast_to(bet_percent, self.num_envs)[active]
+
+        # draw 2 cards for each player and dealer, sequence matters
+        self._draw(self.player_hands, active)
+        self._draw(self.dealer_hands, active)
+        self._draw(self.player_hands, active)
+        self._draw(self.dealer_hands, active)
+
+        player_scores = get_hand_values(self.player_hands)
+        dealer_scores = get_hand_values(self.dealer_hands)
+        # Case 1 - Both have natural blackjack, push with no cash change
+        # Case 2 - Dealer has natural blackjack, loss is immediately
+        dealer_natural = active & (dealer_scores == 21)
+        loss = dealer_natural & (player_scores != 21)
+        self.remaining_cash -= self._get_bet_amounts() * loss
+
+        rewards = np.where(loss, self._get_terminal_rewards(), 0.0)
+        self.terminated |= dealer_natural
+        return rewards, self.terminated.copy()
+
+    def card_step(self, take_card: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the reward and whether the game has terminated, for each game
+        """
+        active = ~self.terminated
+        take_card = np.broadcast_to(take_card, self.num_envs)
+        bet_amount = self._get_bet_amounts()
+        rewards = np.zeros(self.num_envs)
+        game_terminated = np.zeros(self.num_envs, dtype=bool)
+        cash_change = np.zeros(self.num_envs, dtype=np.int64)
+
+        hit = active & take_card
+        self._draw(self.player_hands, hit)
+        player_scores = get_hand_values(self.player_hands)
+        # bust, immediately lose
+        bust = hit & (player_scores > 21)
+        game_terminated |= bust
+        cash_change -= bet_amount * bust
+
+        stand = active & ~take_card
+        # Penalize invalid action when the player tries to stand with score < 16
+        rewards[stand & (player_scores < 16)] = -1.0
+        stand &= player_scores >= 16
+        game_terminated |= stand
+
+        # Player has natural blackjack, outcome is immediate and wins 2 times the bet
+        natural = stand & (player_scores == 21) & (self.player_hands.sum(axis=1) == 2)
+        cash_change += 2 * bet_amount * natural
+
+        # Draw card until score is greater than or equal to 17 for dealer (house rules)
+        play = stand & ~natural
+        dealer_scores = get_hand_values(self.dealer_hands)
+        drawing = play & (dealer_scores < 17)
+        while drawing.any():
+            self._draw(self.dealer_hands, drawing)
+            dealer_scores = get_hand_values(self.dealer_hands)
+            drawing &= dealer_scores < 17
+
+        # player wins if dealer busts or has a lower score, and loses if dealer has a higher score
+        win = play & ((dealer_scores > 21) | (dealer_scores < player_scores))
+        loss = play & (dealer_scores <= 21) & (dealer_scores > player_scores)
+        cash_change += bet_amount * win - bet_amount * loss
+
+        self.remaining_cash += cash_change
+        self.max_attained_cash = np.maximum(self.max_attained_cash, self.remaining_cash)
+        rewards = np.where(game_terminated, self._get_terminal_rewards(), rewards)
+        self.terminated |= game_terminated
+        return rewards, self.terminated.copy()
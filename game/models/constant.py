@@ -1,5 +1,7 @@
 from enum import IntEnum
 
+import numpy as np
+
 
 class Card(IntEnum):
     # needs to ace's special case when it's considered to be 1, 10 or 11
@@ -21,3 +23,14 @@ class Card(IntEnum):
 class PlayerType(IntEnum):
     player = 1
     dealer = 2
+
+
+# position of each card in fixed-size per-card count arrays
+CARD_INDEX: dict[Card, int] = {card: i for i, card in enumerate(Card)}
+# card at each position, inverse of CARD_INDEX
+CARDS: tuple[Card, ...] = tuple(Card)
+ACE_INDEX: int = CARD_INDEX[Card.ace]
+# value of each card with aces counted as 1, indexed by CARD_INDEX
+CARD_VALUE: np.ndarray = np.array([min(card, 10) for card in Card], dtype=np.int8)
+# same values as plain ints, for scalar lookups outside numpy
+CARD_VALUE_BY_INDEX: tuple[int, ...] = tuple(CARD_VALUE.tolist())
@@ -1,6 +1,6 @@
 import numpy as np
 
-from game.models.constant import Card
+from game.models.constant import Card, CARD_INDEX, CARDS
 
 
 class Deck:
@@ -12,16 +12,33 @@ class Deck:
         if deck_nums < 1:
             raise ValueError("deck_nums has to be >= 1")
 
-        one_suit_of_cards = [card for card in Card]
+        one_suit_of_cards = [CARD_INDEX[card] for card in Card]
         one_deck_of_cards = one_suit_of_cards * 4
-        self.cards = one_deck_of_cards * deck_nums
+        # cards are stored by CARD_INDEX and drawn from the end, cards[:remaining] are still in the deck
+        self.cards = np.array(one_deck_of_cards * deck_nums, dtype=np.int8)
+        self.remaining: int = len(self.cards)
         self.shuffle()
 
+    def reset_full(self):
+        """
+        Returns every drawn card to the deck, shuffle before drawing again
+        """
+        self.remaining = len(self.cards)
+
     def shuffle(self):
-        np.random.shuffle(self.cards)
+        np.random.shuffle(self.cards[:self.remaining])
+
+    def draw(self) -> Card:
+        return CARDS[self.draw_index()]
 
-    def draw(self):
-        return self.cards.pop()
+    def draw_index(self) -> int:
+        """
+        Draws a card and returns its CARD_INDEX position, skipping the lookup of the Card itself
+        """
+        if self.remaining == 0:
+            raise IndexError("draw from empty deck")
+        self.remaining -= 1
+        return int(self.cards[self.remaining])
 
     def get_remaining_cards(self) -> int:
-        return len(self.cards)
+        return self.remaining
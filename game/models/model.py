@@ -1,51 +1,82 @@
-from collections import Counter
-from typing import Optional, List
+from dataclasses import dataclass, field
+from typing import Final, Optional, List
 
 import numpy as np
 import torch
-from pydantic import BaseModel
 
 from game.models.constant import Card, PlayerType
 
+# number of cards in hand + number of cards discarded + bet percent + remaining cash
+STATE_SIZE: Final[int] = len(Card) * 2 + 2
 
-class GameState(BaseModel):
+
+@dataclass(slots=True)
+class GameState:
     deck_nums: int
     initial_cash: int
     turn: PlayerType
-    hand: Counter[Card]
-    discarded: Counter[Card]
+    hand: np.ndarray  # count of each card in hand, indexed by CARD_INDEX
+    discarded: np.ndarray  # count of each card discarded, indexed by CARD_INDEX
     bet_percent: Optional[float]  # % of my remaining cash I am betting
     remaining_cash: int  # total cash I have left
+    # reusable output buffer for flatten, sized for the largest state
+    state_buffer: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    # reusable (1, state size) host tensor for torch_flatten, pinned when CUDA is available
+    torch_buffer: Optional[torch.Tensor] = field(default=None, repr=False, compare=False)
+
+    def __eq__(self, other) -> bool:
+        # hand and discarded are arrays, so they need an element-wise comparison
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return (
+            self.deck_nums == other.deck_nums
+            and self.initial_cash == other.initial_cash
+            and self.turn == other.turn
+            and self.bet_percent == other.bet_percent
+            and self.remaining_cash == other.remaining_cash
+            and np.array_equal(self.hand, other.hand)
+            and np.array_equal(self.discarded, other.discarded)
+        )
 
     @staticmethod
     def get_state_size(add_steps: bool = False) -> int:
-        # number of cards in hand + number of cards discarded + bet percent + remaining cash
-        return len(Card) * 2 + 2 + (1 if add_steps else 0)
+        return STATE_SIZE + (1 if add_steps else 0)
 
     def flatten(self, include_discarded: bool = True, step_num: Optional[float] = None) -> np.ndarray:
         """
         Flattens the response into a 1D numpy array. Used as input for backend ML training.
+        If a state buffer is set, the output is a view of it and is overwritten by the next call.
         """
-        output = []
-        for card in Card:
-            output.append(self.hand[card] / self.deck_nums if card in self.hand else 0)
-        for card in Card:
-            output.append(
-                self.discarded[card] / self.deck_nums
-                if include_discarded and card in self.discarded
-                else 0
-            )
-        output.append(self.bet_percent or 0)
-        output.append(self.remaining_cash / self.initial_cash)
+        state_size = STATE_SIZE if step_num is None else STATE_SIZE + 1
+        if self.state_buffer is None:
+            output = np.empty(state_size)
+        else:
+            output = self.state_buffer[:state_size]
+
+        num_cards = len(Card)
+        np.divide(self.hand, self.deck_nums, out=output[:num_cards])
+        if include_discarded:
+            np.divide(self.discarded, self.deck_nums, out=output[num_cards:num_cards * 2])
+        else:
+            output[num_cards:num_cards * 2] = 0
+        output[STATE_SIZE - 2] = self.bet_percent or 0
+        output[STATE_SIZE - 1] = self.remaining_cash / self.initial_cash
         if step_num is not None:
-            output.append(step_num)
-        return np.array(output)
+            output[STATE_SIZE] = step_num
+        return output
 
     def torch_flatten(self, device, include_discarded: bool = True, step_num: Optional[float] = None) -> torch.Tensor:
-        return torch.Tensor(self.flatten(include_discarded=include_discarded, step_num=step_num)).unsqueeze(0).to(device)
+        output = self.flatten(include_discarded=include_discarded, step_num=step_num)
+        if self.torch_buffer is None:
+            return torch.from_numpy(output).float().unsqueeze(0).to(device)
+        host = self.torch_buffer[:, :output.shape[0]]
+        host[0].copy_(torch.from_numpy(output))
+        # always copy, the returned tensor is kept by training code while the buffer is reused
+        return host.to(device, copy=True)
 
 
-class ActionOutcome(BaseModel):
+@dataclass(slots=True)
+class ActionOutcome:
     new_state: GameState
     # amount of cash won/loss
     # should be int but left as float for convenience
@@ -1,7 +1,10 @@
 from typing import List, Union
-from collections import Counter
 
-from game.models.constant import Card, PlayerType
+import numpy as np
+
+from game.models.constant import ACE_INDEX, Card, CARD_VALUE, CARD_VALUE_BY_INDEX, PlayerType
+from game.models.deck import Deck
+from game.models.scoring import play_dealer
 
 
 class Player:
@@ -11,57 +14,45 @@ class Player:
 
     def __init__(self, player_type: PlayerType):
         self.player_type = player_type
-        self.hand: Counter[Card] = Counter()
+        # number of cards held of each type, indexed by CARD_INDEX
+        self.hand: np.ndarray = np.zeros(len(Card), dtype=np.int16)
+        # reset_hand copies the hand out here, so the hand array itself is never replaced
+        self._discarded: np.ndarray = np.zeros(len(Card), dtype=np.int16)
+        # running hand value with every ace counted as 1, and number of aces held
+        self._base: int = 0
+        self._aces: int = 0
 
     def get_hand_value(self) -> int:
-        def get_value_with_aces(hand):
-            # This method deals with hands that have an ace.
-            # First case is where there are only 2 cards and they are both aces
-            total_cards = sum(hand.values())
-            if total_cards == 2 and hand[Card.ace] == 2:
-                return 21
-            # Second case is where there is only 1 ace and the other card is a 10 value card
-            elif total_cards == 2 and hand[Card.ace] == 1 and (hand[Card.jack] == 1 or
-                                                               hand[Card.queen] == 1 or
-                                                               hand[Card.king] == 1 or
-                                                               hand[Card.ten] == 1):
-                return 21
-            # Third case is where there are an arbitrary number of aces and arbitrary number of other cards
-            # In this case, there are 2 possibilities: The aces are either 1 or 11
-            # We will try to make the aces 11 first, and if the value of the hand is > 21, we will make the ace 1
-            else:
-                hand_value = 0
-                for card, count in hand.items():
-                    if card in [Card.jack, Card.queen, Card.king]:
-                        hand_value += 10 * count
-                    else:
-                        hand_value += card * count
-                # Now we will try to make the aces 11
-                for i in range(hand[Card.ace]):
-                    if hand_value + 10 <= 21:
-                        hand_value += 10
-                return hand_value
-        hand_value = 0
-        # Separate the ace cases from the rest of the cards
-        if Card.ace not in self.hand:
-            for card, count in self.hand.items():
-                if card in [Card.jack, Card.queen, Card.king]:
-                    hand_value += 10 * count
-                else:
-                    hand_value += card * count
-            return hand_value
-        else:
-            return get_value_with_aces(self.hand)
+        # At most one ace can ever be counted as 11, since two would add 20 and always bust
+        return self._base + 10 * ((self._aces > 0) & (self._base + 10 <= 21))
+
+    def draw(self, deck: Deck) -> int:
+        """
+        Draws a card from the deck and returns the new hand value
+        """
+        index = deck.draw_index()
+        self.hand[index] += 1
+        self._aces += index == ACE_INDEX
+        self._base += CARD_VALUE_BY_INDEX[index]
+        return self.get_hand_value()
 
-    def draw(self, deck) -> None:
-        card = deck.draw()
-        self.hand[card] += 1
+    def play_dealer_turn(self, deck: Deck) -> int:
+        """
+        Draws until the hand is worth at least 17 (house rules) and returns the final hand value
+        """
+        deck.remaining = play_dealer(self.hand, deck.cards, deck.remaining)
+        self._base = int(self.hand @ CARD_VALUE)
+        self._aces = int(self.hand[ACE_INDEX])
+        return self.get_hand_value()
 
-    def reset_hand(self) -> Counter[Card]:
+    def reset_hand(self) -> np.ndarray:
         """
         Resets player's hand and return discarded cards
+        The returned array is reused by the next reset
         """
 
-        discarded = self.hand
-        self.hand = Counter()
-        return discarded
+        np.copyto(self._discarded, self.hand)
+        self.hand.fill(0)
+        self._base = 0
+        self._aces = 0
+        return self._discarded
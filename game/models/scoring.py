@@ -0,0 +1,39 @@
+import numpy as np
+from numba import njit, int8, int16, int64
+
+from game.models.constant import ACE_INDEX, CARD_VALUE
+
+
+@njit(int64(int16[::1]), cache=True)
+def score_hand(hand: np.ndarray) -> int:
+    """
+    Value of a single hand indexed by CARD_INDEX
+    """
+    base = 0
+    for i in range(hand.shape[0]):
+        base += hand[i] * CARD_VALUE[i]
+    # At most one ace can ever be counted as 11, since two would add 20 and always bust
+    return base + 10 * ((hand[ACE_INDEX] > 0) & (base + 10 <= 21))
+
+
+@njit(int64(int16[::1], int8[::1], int64), cache=True)
+def play_dealer(hand: np.ndarray, cards: np.ndarray, remaining: int) -> int:
+    """
+    Draws cards from the end of the deck into the dealer's hand until its value is at least 17 (house rules).
+    Hand and cards are indexed by CARD_INDEX, returns the number of cards left in the deck.
+    """
+    while score_hand(hand) < 17:
+        if remaining <= 0:
+            raise IndexError("draw from empty deck")
+        remaining -= 1
+        hand[cards[remaining]] += 1
+    return remaining
+
+
+def get_hand_values(hands: np.ndarray) -> np.ndarray:
+    """
+    Values of a batch of hands, one hand per row indexed by CARD_INDEX
+    """
+    base = hands @ CARD_VALUE
+    # At most one ace can ever be counted as 11, since two would add 20 and always bust
+    return base + 10 * ((hands[:, ACE_INDEX] > 0) & (base + 10 <= 21))